@@ -59,30 +59,37 @@ OPERATIONS = (
     + Result.list()
 )
 
+# Used for membership checks on every log line
+_OPERATIONS_SET = frozenset(OPERATIONS)
+
 
 # Start line
 START_LINE = ".*Project content is packed for delivery.*"
 
+# Patterns are compiled once, they are checked for every line in the log
+_START_LINE_RE = re.compile(START_LINE)
+_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_TIME_RE = re.compile(r"\d{2}:\d{2}:\d{2}")
+
 
 def _match_date(date: str) -> bool:
-    return re.match(r"\d{4}-\d{2}-\d{2}", date) is not None
+    return _DATE_RE.match(date) is not None
 
 
 def _match_time(time: str) -> bool:
-    return re.match(r"\d{2}:\d{2}:\d{2}", time) is not None
+    return _TIME_RE.match(time) is not None
 
 
 def is_initial_line(line: str) -> bool:
     if not line:
         return False
 
-    pattern = re.compile(START_LINE)
     parts = line.strip().split(" ")
     return (
         len(parts) > 2
         and _match_date(parts[0])
         and _match_time(parts[1])
-        and re.match(pattern, line) is not None
+        and _START_LINE_RE.match(line) is not None
     )
 
 
@@ -110,7 +117,7 @@ def is_any_operation(line: str) -> bool:
         len(parts) > 2
         and _match_date(parts[0])
         and _match_time(parts[1])
-        and parts[2] in OPERATIONS
+        and parts[2] in _OPERATIONS_SET
     )
 
 
@@ -179,7 +186,7 @@ def is_detail(line: str) -> bool:
         is_operation(line, ExecutionInfo.DEBUG)
         or is_operation(line, ExecutionInfo.ERROR)
         or is_operation(line, ExecutionInfo.WARNING)
-    ) and line.strip()[-1:] == ":"
+    ) and line.rstrip()[-1:] == ":"
 
 
 # Error/Debug/Failed output finishes when a new other line starts
@@ -189,5 +196,5 @@ def is_detail_finished(line: str) -> bool:
         len(parts) > 3
         and _match_date(parts[0])
         and _match_time(parts[1])
-        and parts[2] in OPERATIONS
+        and parts[2] in _OPERATIONS_SET
     )
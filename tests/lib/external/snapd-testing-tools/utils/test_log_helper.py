@@ -0,0 +1,172 @@
+import unittest
+
+import log_helper
+
+
+DATE = "2024-05-20"
+TIME = "10:11:12"
+
+
+class TestLogHelper(unittest.TestCase):
+
+    def test_operation(self) -> None:
+        line = f"{DATE} {TIME} Executing google:ubuntu-22.04-64:tests/main/foo (1/10)...\n"
+        self.assertTrue(log_helper.is_operation(line, log_helper.ExecutionPhase.EXECUTING))
+        self.assertFalse(log_helper.is_operation(line, log_helper.ExecutionPhase.PREPARING))
+        self.assertTrue(log_helper.is_any_operation(line))
+        self.assertTrue(log_helper.is_detail_finished(line))
+        self.assertEqual(DATE, log_helper.get_date(line))
+        self.assertEqual(TIME, log_helper.get_time(line))
+        self.assertEqual("Executing", log_helper.get_operation(line))
+        self.assertEqual(
+            "google:ubuntu-22.04-64:tests/main/foo (1/10)...",
+            log_helper.get_operation_info(line),
+        )
+
+    def test_unknown_operation(self) -> None:
+        line = f"{DATE} {TIME} Unknown something"
+        self.assertFalse(log_helper.is_any_operation(line))
+        self.assertFalse(log_helper.is_detail_finished(line))
+        self.assertEqual("Unknown", log_helper.get_operation(line))
+
+    def test_empty_line(self) -> None:
+        self.assertFalse(log_helper.is_initial_line(""))
+        self.assertFalse(log_helper.is_operation("", log_helper.ExecutionInfo.ERROR))
+        self.assertFalse(log_helper.is_any_operation(""))
+        self.assertFalse(log_helper.is_detail_start(""))
+        self.assertFalse(log_helper.is_detail(""))
+        self.assertFalse(log_helper.is_detail_finished(""))
+        for getter in (
+            log_helper.get_date,
+            log_helper.get_time,
+            log_helper.get_operation,
+            log_helper.get_operation_info,
+        ):
+            with self.assertRaises(RuntimeError):
+                getter("")
+
+    def test_leading_whitespace(self) -> None:
+        # Lines are stripped before splitting, so indentation before the date is ignored
+        line = f"  \t{DATE} {TIME} Error executing google:ubuntu-22.04-64:tests/main/foo :\n"
+        self.assertTrue(log_helper.is_operation(line, log_helper.ExecutionInfo.ERROR))
+        self.assertTrue(log_helper.is_detail_start(line))
+        self.assertTrue(log_helper.is_detail(line))
+        self.assertTrue(log_helper.is_detail_finished(line))
+        self.assertEqual(DATE, log_helper.get_date(line))
+        self.assertEqual(TIME, log_helper.get_time(line))
+        self.assertEqual("Error", log_helper.get_operation(line))
+        self.assertEqual(
+            "executing google:ubuntu-22.04-64:tests/main/foo :",
+            log_helper.get_operation_info(line),
+        )
+
+    def test_initial_line(self) -> None:
+        line = f"{DATE} {TIME} Project content is packed for delivery (1.00MB).\n"
+        self.assertTrue(log_helper.is_initial_line(line))
+        self.assertTrue(log_helper.is_initial_line("  " + line))
+        self.assertFalse(log_helper.is_initial_line("Project content is packed for delivery"))
+        self.assertFalse(log_helper.is_initial_line(f"{DATE} {TIME} Project content is ready"))
+
+    def test_runs_of_spaces_between_fields(self) -> None:
+        # Fields are separated by exactly one space, an extra space
+        # shifts the fields so the line has no valid time or operation
+        for line in (
+            f"{DATE}  {TIME} Error executing foo :",
+            f"{DATE} {TIME}  Error executing foo :",
+        ):
+            self.assertFalse(log_helper.is_operation(line, log_helper.ExecutionInfo.ERROR))
+            self.assertFalse(log_helper.is_any_operation(line))
+            self.assertFalse(log_helper.is_detail_start(line))
+            self.assertFalse(log_helper.is_detail(line))
+            self.assertFalse(log_helper.is_detail_finished(line))
+            self.assertEqual(DATE, log_helper.get_date(line))
+
+        line = f"{DATE}  {TIME} Error executing foo :"
+        with self.assertRaises(ValueError):
+            log_helper.get_time(line)
+        with self.assertRaises(ValueError):
+            log_helper.get_operation(line)
+
+        line = f"{DATE} {TIME}  Error executing foo :"
+        self.assertEqual(TIME, log_helper.get_time(line))
+        self.assertEqual("", log_helper.get_operation(line))
+        self.assertEqual("Error executing foo :", log_helper.get_operation_info(line))
+
+    def test_operation_info_keeps_spaces(self) -> None:
+        line = f"{DATE} {TIME} Debug output  with   several    spaces \n"
+        self.assertEqual(
+            "output  with   several    spaces",
+            log_helper.get_operation_info(line),
+        )
+        line = f"{DATE} {TIME} Error  starts with a space"
+        self.assertEqual(" starts with a space", log_helper.get_operation_info(line))
+
+    def test_short_lines(self) -> None:
+        # Lines shorter than a date can't begin with one
+        for line in ("2024", "2024-05", "2024-0", "-", " 2024-05 ", "a-b-c"):
+            self.assertFalse(log_helper.is_initial_line(line))
+            self.assertFalse(log_helper.is_operation(line, log_helper.ExecutionInfo.ERROR))
+            self.assertFalse(log_helper.is_any_operation(line))
+            self.assertFalse(log_helper.is_detail_start(line))
+            self.assertFalse(log_helper.is_detail(line))
+            self.assertFalse(log_helper.is_detail_finished(line))
+            for getter in (
+                log_helper.get_date,
+                log_helper.get_time,
+                log_helper.get_operation,
+                log_helper.get_operation_info,
+            ):
+                with self.assertRaises(ValueError):
+                    getter(line)
+
+    def test_date_without_time(self) -> None:
+        line = f"{DATE} not-a-time Error"
+        self.assertFalse(log_helper.is_any_operation(line))
+        self.assertEqual(DATE, log_helper.get_date(line))
+        with self.assertRaises(ValueError):
+            log_helper.get_time(line)
+
+    def test_date_and_time_only(self) -> None:
+        line = f"{DATE} {TIME}"
+        self.assertFalse(log_helper.is_any_operation(line))
+        self.assertFalse(log_helper.is_detail_finished(line))
+        for getter in (
+            log_helper.get_date,
+            log_helper.get_time,
+            log_helper.get_operation,
+            log_helper.get_operation_info,
+        ):
+            with self.assertRaises(ValueError):
+                getter(line)
+
+    def test_three_fields(self) -> None:
+        # An operation without information after it starts a detail
+        # but doesn't finish the previous one
+        line = f"{DATE} {TIME} Error\n"
+        self.assertTrue(log_helper.is_operation(line, log_helper.ExecutionInfo.ERROR))
+        self.assertTrue(log_helper.is_any_operation(line))
+        self.assertTrue(log_helper.is_detail_start(line))
+        self.assertFalse(log_helper.is_detail(line))
+        self.assertFalse(log_helper.is_detail_finished(line))
+        self.assertFalse(log_helper.is_detail_finished(line + "   "))
+        self.assertEqual("Error", log_helper.get_operation(line))
+        with self.assertRaises(ValueError):
+            log_helper.get_operation_info(line)
+
+    def test_detail(self) -> None:
+        line = f"{DATE} {TIME} Debug output for foo : \n"
+        self.assertTrue(log_helper.is_detail(line))
+        self.assertTrue(log_helper.is_detail_start(line))
+        line = f"{DATE} {TIME} WARNING: something happened:"
+        self.assertTrue(log_helper.is_detail(line))
+        line = f"{DATE} {TIME} Debug output for foo"
+        self.assertFalse(log_helper.is_detail(line))
+        self.assertTrue(log_helper.is_detail_start(line))
+        # Failed starts a detail but is never a detail header itself
+        line = f"{DATE} {TIME} Failed tasks:"
+        self.assertTrue(log_helper.is_detail_start(line))
+        self.assertFalse(log_helper.is_detail(line))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,7 +3,6 @@
 from abc import abstractmethod, ABC
 import argparse
 from collections import defaultdict
-import concurrent.futures
 from contextlib import closing
 import copy
 import datetime
@@ -15,7 +14,7 @@ import pymongo.collection
 import sys
 from typing import Any, Iterable, Optional
 
-from features import SystemFeatures, Cmd, Endpoint, Status, Task, Change, Interface
+from features import SystemFeatures, TaskFeatures, Cmd, Endpoint, Status, Task, Change, Interface
 
 KNOWN_FEATURES = ["cmds", "endpoints", "ensures", "tasks", "changes", "interfaces"]
 
@@ -24,6 +23,8 @@ ALL_FEATURES_FILE = "all-features.json"
 
 
 class TaskId:
+    __slots__ = ("suite", "task_name")
+
     suite: str
     task_name: str
 
@@ -44,6 +45,8 @@ class TaskId:
 
 
 class TaskIdVariant(TaskId):
+    __slots__ = ("variant",)
+
     variant: str
 
     def __init__(self, suite: str, task_name: str, variant: str) -> None:
@@ -243,14 +246,16 @@ class DirRetriever(Retriever):
 
     def get_sorted_timestamps_and_systems(self) -> list[dict[str, Any]]:
         dictionary = defaultdict(list)
-        for timestamp in os.listdir(self.dir):
-            timestamp_path = os.path.join(self.dir, timestamp)
-            if not os.path.isdir(timestamp_path):
-                continue
-            for filename in os.listdir(timestamp_path):
-                if filename.endswith(".json") and not filename == ALL_FEATURES_FILE:
-                    system = self.__get_filename_without_last_ext(filename)
-                    dictionary[timestamp].append(system)
+        # scandir entries know their type from the directory listing,
+        # which avoids a stat call per entry
+        with os.scandir(self.dir) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                for filename in os.listdir(entry.path):
+                    if filename.endswith(".json") and not filename == ALL_FEATURES_FILE:
+                        system = self.__get_filename_without_last_ext(filename)
+                        dictionary[entry.name].append(system)
         return [{"timestamp": entry[0], "systems": entry[1]} for entry in sorted(dictionary.items(), reverse=True)]
 
     def _get_systems(self, timestamp: str, systems: list[str] = None) -> Iterable[SystemFeatures]:
@@ -298,7 +303,9 @@ def consolidate_system_features(
     :param exclude_tasks: if not None, will not consolidate tasks present in this list
     :returns: a dictionary with only feature data
     """
-    features = defaultdict(list)
+    # per feature name, the features keyed by their canonical json,
+    # dicts keep the order in which features were first seen
+    unique = defaultdict(dict)
     for test in system_json["tests"]:
         if (
             include_tasks is not None
@@ -314,10 +321,12 @@ def consolidate_system_features(
         for feature_name in test.keys():
             if feature_name not in KNOWN_FEATURES:
                 continue
+            if not test[feature_name]:
+                continue
+            features = unique[feature_name]
             for feature in test[feature_name]:
-                if feature not in features[feature_name]:
-                    features[feature_name].append(feature)
-    return features
+                features.setdefault(_feature_key(feature_name, feature), feature)
+    return defaultdict(list, ((name, list(features.values())) for name, features in unique.items()))
 
 
 def minus(first: dict[str, list], second: dict[str, list]) -> dict:
@@ -658,16 +667,60 @@ def find_feat(
     return ret
 
 
-def check_duplicate(args):
-    task, system_json = args
-    # Exclude all variants of the task from consolidation so that
-    # it isn't flagged as a duplicate when variants of the same
-    # task have identical features.
+def _feature_key(feature_name: str, feature: Optional[dict]) -> tuple[str, str]:
+    # A None feature stands for the feature name itself, which is
+    # present as soon as a test has at least one feature of that kind
+    if feature is None:
+        return feature_name, ""
+    # Features only hold json types, anything else raises a TypeError
+    # rather than being encoded in a way that could collide with another
+    return feature_name, json.dumps(feature, sort_keys=True)
+
+
+def build_dup_index(system_json: SystemFeatures) -> dict[tuple[str, str], dict[TaskId, int]]:
+    """
+    Indexes the features of a system by the tasks that contain them, so that
+    duplicate checks don't need to consolidate the whole system for each task.
+
+    :returns: dictionary where each key identifies a feature and each value counts,
+    for each task (all variants together), the number of tests containing the feature
+    """
+    index = defaultdict(lambda: defaultdict(int))
+    for test in system_json["tests"]:
+        task_id = TaskId(suite=test["suite"], task_name=test["task_name"])
+        for feature_name in test.keys():
+            if feature_name not in KNOWN_FEATURES or not test[feature_name]:
+                continue
+            index[_feature_key(feature_name, None)][task_id] += 1
+            for feature in test[feature_name]:
+                index[_feature_key(feature_name, feature)][task_id] += 1
+    return {key: dict(tasks) for key, tasks in index.items()}
+
+
+def check_duplicate(task: TaskFeatures, dup_index: dict[tuple[str, str], dict[TaskId, int]]) -> Optional[TaskIdVariant]:
+    """
+    Checks if the features of a task are all present in other tasks of the system.
+
+    :param task: the task to check
+    :param dup_index: the result of build_dup_index for the system the task belongs to
+    :returns: the task as a TaskIdVariant if it is a duplicate, otherwise None
+    """
+    # Ignore all variants of the task so that it isn't flagged as
+    # a duplicate when variants of the same task have identical features.
     task_id = TaskId(suite=task["suite"], task_name=task["task_name"])
-    features = consolidate_system_features(system_json, exclude_tasks=[task_id])
     to_check = {key: value for key, value in task.items() if key in KNOWN_FEATURES}
-    mns = minus(to_check, features)
-    if to_check and not mns:
+    if not to_check:
+        return None
+
+    def in_other_task(feature_name: str, feature: Optional[dict]) -> bool:
+        tasks = dup_index.get(_feature_key(feature_name, feature), {})
+        return len(tasks) > 1 or (len(tasks) == 1 and task_id not in tasks)
+
+    if all(
+        in_other_task(feature_name, feature)
+        for feature_name, feature_list in to_check.items()
+        for feature in feature_list or [None]
+    ):
         return TaskIdVariant(suite=task["suite"], task_name=task["task_name"], variant=task["variant"])
     return None
 
@@ -690,12 +743,12 @@ def dup(retriever: Retriever, timestamp: str, system: str, remove_failed: bool)
         )
         system_json["tests"] = [task for task in tests if task["success"]]
 
+    dup_index = build_dup_index(system_json)
     duplicates = []
-    with concurrent.futures.ProcessPoolExecutor() as executor:
-        results = executor.map(check_duplicate, [(task, system_json) for task in system_json["tests"]])
-        for result in results:
-            if result is not None:
-                duplicates.append(result)
+    for task in system_json["tests"]:
+        result = check_duplicate(task, dup_index=dup_index)
+        if result is not None:
+            duplicates.append(result)
 
     return duplicates
 
@@ -1,17 +1,18 @@
 
 import argparse
+from collections import Counter, defaultdict
+from contextlib import redirect_stderr, redirect_stdout
 from copy import deepcopy
 from datetime import datetime
+import functools
 from io import StringIO
 import json
 import os
-from pathlib import Path
 import pytest
 import sys
 import tempfile
-from typing import Iterable
-import unittest
-from unittest.mock import Mock, patch
+from typing import Iterable, Optional
+from unittest.mock import patch
 # To ensure the unit test can be run from any point in the filesystem,
 # add parent folder to path to permit relative imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -36,16 +37,41 @@ class DictRetriever(query_features.Retriever):
     def _get_single_json(self, timestamp: str, system: str) -> SystemFeatures:
         return deepcopy(self.data[timestamp][system])
 
-    def _get_systems(self, timestamp: str, systems: list[str] = None) -> Iterable[SystemFeatures]:    
+    def _get_systems(self, timestamp: str, systems: list[str] = None) -> Iterable[SystemFeatures]:
+        data = self.data[timestamp]
         if systems:
-            return [deepcopy(self.data[timestamp][system]) for system in systems]
+            # Returned as is by the retriever, tests index into it
+            return [deepcopy(data[system]) for system in systems]
         else:
-            return [deepcopy(data) for _, data in self.data[timestamp].items()]
+            # The retriever builds its cached list from this
+            return (deepcopy(system_data) for system_data in data.values())
 
     def _get_all_features(self, timestamp):
         return deepcopy(self.all_features[timestamp])
 
 
+# Credentials file given to the mocked MongoRetriever, which never reads
+# it, so a single instance can be shared by all tests
+EMPTY_CREDS_FILE = StringIO('')
+
+
+def to_multiset(values: list) -> Counter:
+    # Compares lists, and the lists in their dicts, ignoring order but not duplicates
+    def canonical(value):
+        if isinstance(value, dict):
+            value = {key: sorted(v, key=lambda x: json.dumps(x, sort_keys=True)) if isinstance(v, list) else v
+                     for key, v in value.items()}
+        return json.dumps(value, sort_keys=True)
+    return Counter(canonical(value) for value in values)
+
+
+@functools.cache
+def parse_timestamp(timestamp: str) -> datetime:
+    # Fixtures reuse a few timestamps across all tests and datetime
+    # objects are immutable, so each one is parsed only once
+    return datetime.fromisoformat(timestamp)
+
+
 class FakeClient:
     def close(self):
         pass
@@ -65,16 +91,48 @@ class FakeCollectionReturn:
         return self.l
 
 
+def populate_dir(base_dir: str, files: dict[str, Optional[dict]]) -> None:
+    '''
+    Creates the given files under base_dir. Files with None content are left
+    empty, the rest are written as json. A path ending in '/' creates an
+    empty directory.
+    '''
+    for path, content in files.items():
+        full_path = os.path.join(base_dir, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        if path.endswith('/'):
+            continue
+        if content is None:
+            os.close(os.open(full_path, os.O_CREAT | os.O_WRONLY, 0o644))
+            continue
+        with open(full_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(content))
+
+
 class FakeMongoCollection:
     def __init__(self, list_json):
         self.list_json = list_json
+        # Queries from query_features filter by timestamp, so index the
+        # documents by it and only scan the ones at the given timestamp
+        self.by_timestamp = defaultdict(list)
+        for doc in self.list_json:
+            if 'timestamp' in doc:
+                self.by_timestamp[FakeMongoCollection.to_datetime(doc['timestamp'])].append(doc)
 
     def find(self, dictionary=None, projection=None):
+        docs = self.list_json
+        if dictionary and 'timestamp' in dictionary:
+            docs = self.by_timestamp.get(FakeMongoCollection.to_datetime(dictionary['timestamp']), [])
         l = []
-        for doc in self.list_json:
+        for doc in docs:
             if not dictionary or all(FakeMongoCollection.check_equals(key, dictionary, doc) for key in dictionary.keys()):
                 l.append(doc)
         return FakeCollectionReturn(l)
+
+    def to_datetime(ts):
+        if isinstance(ts, str):
+            return parse_timestamp(ts)
+        return ts
     
     def check_equals(key, dict1, dict2):
         if key not in dict1 or key not in dict2:
@@ -83,22 +141,20 @@ class FakeMongoCollection:
         ts2 = dict2[key]
         if key != 'timestamp':
             return ts1 == ts2
-        if isinstance(ts1, str):
-            ts1 = datetime.fromisoformat(ts1)
-        if isinstance(ts2, str):
-            ts2 = datetime.fromisoformat(ts2)
-        return ts1 == ts2
+        return FakeMongoCollection.to_datetime(ts1) == FakeMongoCollection.to_datetime(ts2)
             
 
 
 class MongoMocker:
     def __init__(self, collection_data, do_patch_stdout=False):
-        self.collection_data = collection_data
+        # Work on a copy so that the fixture data can be shared between tests
+        self.collection_data = deepcopy(collection_data)
         for data in self.collection_data:
             if 'timestamp' in data:
-                data['timestamp'] = datetime.fromisoformat(data['timestamp'])
+                data['timestamp'] = parse_timestamp(data['timestamp'])
         self.do_patch_stdout = do_patch_stdout
-        self.patch_stdout = None
+        self.stdout = None
+        self.redirect_stdout = None
         self.patch_mongo = None
 
     def get_stdout(self):
@@ -115,118 +171,202 @@ class MongoMocker:
             query_features.MongoRetriever, '__init__', my_init)
         self.patch_mongo.start()
         if self.do_patch_stdout:
-            self.patch_stdout = patch('sys.stdout', new=StringIO())
-            self.stdout = self.patch_stdout.start()
+            self.stdout = StringIO()
+            self.redirect_stdout = redirect_stdout(self.stdout)
+            self.redirect_stdout.__enter__()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.patch_mongo:
             self.patch_mongo.stop()
-        if self.patch_stdout:
-            self.patch_stdout.stop()
+        if self.redirect_stdout:
+            self.redirect_stdout.__exit__(exc_type, exc_val, exc_tb)
 
 
 class DirMocker:
-    def __init__(self, collection_data, do_patch_stdout=False):
+    def __init__(self, collection_data, do_patch_stdout=False, base_dir=None):
         self.collection_data = collection_data
         self.do_patch_stdout = do_patch_stdout
-        self.patch_stdout = None
+        self.stdout = None
+        self.redirect_stdout = None
+        # When a base directory is given, its owner is in charge of removing it
+        self.base_dir = base_dir
         self.tmpdir = None
 
     def get_stdout(self):
         return self.stdout.getvalue()
 
     def get_dir(self):
+        if self.base_dir:
+            return self.base_dir
         return self.tmpdir.name
 
     def __populate_dir(self):
+        docs_by_timestamp = defaultdict(list)
         for doc in self.collection_data:
-            dir = os.path.join(self.tmpdir.name, doc['timestamp'])
-            os.makedirs(dir, exist_ok=True)
-            if 'all_features' in doc:
-                with open(os.path.join(dir, "all-features.json"), 'w', encoding='utf-8') as f:
-                    json.dump(doc, f)
-            else:
-                with open(os.path.join(dir, f'{doc["system"]}.json'), 'w', encoding='utf-8') as f:
+            docs_by_timestamp[doc['timestamp']].append(doc)
+        for timestamp, docs in docs_by_timestamp.items():
+            dir = os.path.join(self.get_dir(), timestamp)
+            os.mkdir(dir)
+            for doc in docs:
+                if 'all_features' in doc:
+                    filename = "all-features.json"
+                else:
+                    filename = f'{doc["system"]}.json'
+                with open(os.path.join(dir, filename), 'w', encoding='utf-8') as f:
                     json.dump(doc, f)
 
     def __enter__(self):
-        self.tmpdir = tempfile.TemporaryDirectory()
+        if self.base_dir:
+            os.makedirs(self.base_dir)
+        else:
+            self.tmpdir = tempfile.TemporaryDirectory()
         self.__populate_dir()
         if self.do_patch_stdout:
-            self.patch_stdout = patch('sys.stdout', new=StringIO())
-            self.stdout = self.patch_stdout.start()
+            self.stdout = StringIO()
+            self.redirect_stdout = redirect_stdout(self.stdout)
+            self.redirect_stdout.__enter__()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.tmpdir.cleanup()
-        if self.patch_stdout:
-            self.patch_stdout.stop()
+        if self.tmpdir:
+            self.tmpdir.cleanup()
+        if self.redirect_stdout:
+            self.redirect_stdout.__exit__(exc_type, exc_val, exc_tb)
 
 
 class TestQueryFeatures:
 
+    @classmethod
+    def setup_class(cls):
+        cls.parse_args_patch = patch.object(argparse.ArgumentParser, 'parse_args')
+        cls.parse_args_mock = cls.parse_args_patch.start()
+
+        # Fixture data shared by tests, mockers don't modify it
+        cls.list_data = [
+            {'timestamp': '2025-05-04', 'system': 'system1'},
+            {'timestamp': '2025-05-04', 'system': 'system2'},
+            {'timestamp': '2025-05-05', 'system': 'system2'}
+        ]
+        cls.export_data = [
+            {'timestamp': '2025-05-04', 'system': 'system1', 'tests': [
+                TaskFeatures(task_name='task1', suite='suite1', variant='', cmds=[{'cmd': 'a'}, {'cmd': 'b'}], endpoints=[{'1': 'a'}]),
+                TaskFeatures(task_name='task2', suite='suite1', variant='', cmds=[{'cmd': 'd'}], endpoints=[{'5': 'd'}])
+            ]},
+            {'timestamp': '2025-05-05', 'system': 'system2', 'tests': [
+                TaskFeatures(task_name='task1', suite='suite1', variant='', cmds=[{'cmd': 'c'}, {'cmd': 'd'}], endpoints=[{'1': 'a'}]),
+                TaskFeatures(task_name='task2', suite='suite1', variant='', cmds=[{'cmd': 'd'}], endpoints=[{'2': 'q'}])
+            ]},
+            {'timestamp': '2025-05-06', 'system': 'system3', 'tests': [
+                TaskFeatures(task_name='task1', suite='suite1', variant='', cmds=[{'cmd': 'a'}])
+            ]},
+        ]
+
+        # System shared by the check_duplicate tests, which don't modify it
+        cls.check_dup_system = SystemFeatures(tests=[
+            TaskFeatures(suite='suite',task_name='task1',variant='a',cmds=[Cmd(cmd='cmd1'),Cmd(cmd='cmd2')]),
+            TaskFeatures(suite='suite',task_name='task1',variant='b',cmds=[Cmd(cmd='cmd1'),Cmd(cmd='cmd2')]),
+            TaskFeatures(suite='suite',task_name='task2',variant='',endpoints=[Endpoint(method='GET', path='/v2/snaps')]),
+            TaskFeatures(suite='suite',task_name='task3',variant='',endpoints=[Endpoint(method='GET', path='/v2/snaps')]),
+            TaskFeatures(suite='suite',task_name='task4',variant='b',cmds=[Cmd(cmd='cmd1')]),
+        ])
+        cls.check_dup_index = query_features.build_dup_index(cls.check_dup_system)
+
+        # A single temporary directory for the whole class,
+        # each test gets its own subdirectory in setup_method
+        cls.tmp_root = tempfile.TemporaryDirectory()
+        cls.tmp_count = 0
+
+        # Read-only features directory shared by the DirRetriever tests
+        cls.dir_all_features = {
+            'timestamp':'timestamp1',
+            'cmds':[Cmd(cmd='snap list'),Cmd(cmd='snap pack')],
+            'changes':[Change(kind='refresh',snap_types=[])],
+            'tasks':[Task(kind='link',snap_types=['snapd'],last_status='Done')]}
+        cls.features_dir = os.path.join(cls.tmp_root.name, 'features')
+        populate_dir(cls.features_dir, {
+            'randomFile': None,
+            'timestamp1/system1.json': SystemFeatures(system='system1'),
+            'timestamp1/system2.json': SystemFeatures(system='system2'),
+            'timestamp1/all-features.json': cls.dir_all_features,
+            'timestamp2/system2.json': SystemFeatures(system='system2'),
+            'timestamp2/randomfile': None,
+            'timestamp3/': None,
+        })
+
+    @classmethod
+    def teardown_class(cls):
+        cls.parse_args_patch.stop()
+        cls.tmp_root.cleanup()
+
+    def setup_method(self, method):
+        # The parse_args patch is shared by the class, don't leak
+        # the namespace or the calls of a test into the next one
+        self.parse_args_mock.reset_mock(return_value=True)
+        type(self).tmp_count += 1
+        self.tmpdir = os.path.join(self.tmp_root.name, f'{method.__name__}-{self.tmp_count}')
+        os.mkdir(self.tmpdir)
+
+    def set_cli_args(self, mocker, **kwargs):
+        # Arguments returned by parse_args, with the data source
+        # arguments that correspond to the mocker in use
+        self.parse_args_mock.return_value = argparse.Namespace(
+            file=EMPTY_CREDS_FILE if isinstance(mocker, MongoMocker) else None,
+            dir=mocker.get_dir() if isinstance(mocker, DirMocker) else None,
+            **kwargs
+        )
+
+    def mocker(self, mocker_class: str, data, **kwargs):
+        if mocker_class == "DirMocker":
+            kwargs['base_dir'] = os.path.join(self.tmpdir, 'data')
+        return globals()[mocker_class](data, **kwargs)
+
     def test_dirretriever_get_sorted_timestamps_and_systems(self):
-        with tempfile.TemporaryDirectory() as tmpdir:
-            os.mkdir(os.path.join(tmpdir, 'timestamp1'))
-            Path(os.path.join(tmpdir, 'randomFile')).touch()
-            os.mkdir(os.path.join(tmpdir, 'timestamp2'))
-            Path(os.path.join(tmpdir, 'timestamp1', 'system1.json')).touch()
-            Path(os.path.join(tmpdir, 'timestamp1', 'system2.json')).touch()
-            Path(os.path.join(tmpdir, 'timestamp2', 'system2.json')).touch()
-            Path(os.path.join(tmpdir, 'timestamp2', 'randomfile')).touch()
-            os.mkdir(os.path.join(tmpdir, 'timestamp3'))
-
-            retriever = query_features.DirRetriever(tmpdir)
+        retriever = query_features.DirRetriever(self.features_dir)
+        results = retriever.get_sorted_timestamps_and_systems()
+        assert 2 == len(results)
+        expected = [{'timestamp':'timestamp2','systems':['system2']},
+                    {'timestamp':'timestamp1','systems':['system1','system2']}]
+        assert to_multiset(expected) == to_multiset(results)
+
+    def test_dirretriever_get_sorted_timestamps_and_systems_no_stat(self):
+        # The listing relies on the entry types reported by scandir,
+        # so it must not stat the entries one by one
+        files = {}
+        for t in range(100):
+            files[f'timestamp{t:03}/randomfile'] = None
+            for s in range(10):
+                files[f'timestamp{t:03}/system{s}.json'] = None
+        populate_dir(self.tmpdir, files)
+
+        retriever = query_features.DirRetriever(self.tmpdir)
+        with patch('os.stat', wraps=os.stat) as stat_mock:
             results = retriever.get_sorted_timestamps_and_systems()
-            assert 2 == len(results)
-            assert {'timestamp':'timestamp2','systems':['system2']} in results
-            assert {'timestamp':'timestamp1','systems':['system1','system2']} in results or {'timestamp':'timestamp1','systems':['system2','system1']} in results
-
+        assert 0 == stat_mock.call_count
+        assert [f'timestamp{t:03}' for t in reversed(range(100))] == [r['timestamp'] for r in results]
+        assert all(sorted(r['systems']) == [f'system{s}' for s in range(10)] for r in results)
 
     def test_dirretriever_get_systems(self):
-        with tempfile.TemporaryDirectory() as tmpdir:
-            os.mkdir(os.path.join(tmpdir, 'timestamp1'))
-            with open(os.path.join(tmpdir, 'timestamp1', 'system1.json'), 'w', encoding='utf-8') as f:
-                json.dump(SystemFeatures(system='system1'), f)
-            with open(os.path.join(tmpdir, 'timestamp1', 'system2.json'), 'w', encoding='utf-8') as f:
-                json.dump(SystemFeatures(system='system2'), f)
-
-            retriever = query_features.DirRetriever(tmpdir)
-            results = list(retriever.get_systems('timestamp1'))
-            assert 2 == len(results)
-            assert SystemFeatures(system='system1') in results
-            assert SystemFeatures(system='system2') in results
-            results = list(retriever.get_systems('timestamp1', ['system1', 'system2']))
-            assert 2 == len(results)
-            assert SystemFeatures(system='system1') in results
-            assert SystemFeatures(system='system2') in results
-            results = list(retriever.get_systems('timestamp1', ['system1']))
-            assert [SystemFeatures(system='system1')] == results
+        retriever = query_features.DirRetriever(self.features_dir)
+        expected = to_multiset([SystemFeatures(system='system1'), SystemFeatures(system='system2')])
+        results = list(retriever.get_systems('timestamp1'))
+        assert expected == to_multiset(results)
+        results = list(retriever.get_systems('timestamp1', ['system1', 'system2']))
+        assert expected == to_multiset(results)
+        results = list(retriever.get_systems('timestamp1', ['system1']))
+        assert [SystemFeatures(system='system1')] == results
 
     def test_dirretriever_get_single_json(self):
-        with tempfile.TemporaryDirectory() as tmpdir:
-            os.mkdir(os.path.join(tmpdir, 'timestamp1'))
-            with open(os.path.join(tmpdir, 'timestamp1', 'system1.json'), 'w', encoding='utf-8') as f:
-                json.dump(SystemFeatures(system='system1'), f)
-            retriever = query_features.DirRetriever(tmpdir)
-            result = retriever.get_single_json('timestamp1', 'system1')
-            assert SystemFeatures(system='system1') == result
+        retriever = query_features.DirRetriever(self.features_dir)
+        result = retriever.get_single_json('timestamp1', 'system1')
+        assert SystemFeatures(system='system1') == result
 
     def test_dirretriever_get_all_features(self):
-        with tempfile.TemporaryDirectory() as tmpdir:
-            os.mkdir(os.path.join(tmpdir, 'timestamp1'))
-            all_features = {
-                'timestamp':'timestamp1',
-                'cmds':[Cmd(cmd='snap list'),Cmd(cmd='snap pack')],
-                'changes':[Change(kind='refresh',snap_types=[])],
-                'tasks':[Task(kind='link',snap_types=['snapd'],last_status='Done')]}
-            with open(os.path.join(tmpdir, 'timestamp1', 'all-features.json'), 'w', encoding='utf-8') as f:
-                json.dump(all_features, f)
-            retriever = query_features.DirRetriever(tmpdir)
-            result = retriever.get_all_features('timestamp1')
-            del all_features['timestamp']
-            assert all_features == result
+        retriever = query_features.DirRetriever(self.features_dir)
+        result = retriever.get_all_features('timestamp1')
+        expected = dict(self.dir_all_features)
+        del expected['timestamp']
+        assert expected == result
 
     def test_consolidate_features(self):
         j = {"tests": [
@@ -239,18 +379,24 @@ class TestQueryFeatures:
              }
         ]}
         c = query_features.consolidate_system_features(j)
-        assert len(c) == 2
-        assert "cmds" in c
-        assert len(c["cmds"]) == 3
-        assert {"cmd": "snap list --all"} in c["cmds"]
-        assert {"cmd": "snap ack file"} in c["cmds"]
-        assert {"cmd": "snap do things"} in c["cmds"]
-        assert "ensures" in c
-        assert len(c["ensures"]) == 2
-        assert {"manager":"SnapManager","function":"ensureFunc1"} in c["ensures"]
-        assert {"manager":"SnapManager","function":"ensureFunc2"} in c["ensures"]
+        assert {"cmds", "ensures"} == c.keys()
+        assert to_multiset([{"cmd": "snap list --all"}, {"cmd": "snap ack file"}, {"cmd": "snap do things"}]) == to_multiset(c["cmds"])
+        assert to_multiset([{"manager":"SnapManager","function":"ensureFunc1"},
+                            {"manager":"SnapManager","function":"ensureFunc2"}]) == to_multiset(c["ensures"])
 
 
+    def test_consolidate_features_large(self):
+        j = {"tests": [
+            {"suite": "suite", "task_name": f"task{i}", "variant": "",
+             "cmds": [{"cmd": "snap list"}, {"cmd": f"snap install snap{i % 100}"}],
+             "ensures": [{"manager": "SnapManager", "function": "ensureFunc"}],
+             "endpoints": []}
+            for i in range(10000)]}
+        c = query_features.consolidate_system_features(j)
+        assert {"cmds", "ensures"} == c.keys()
+        assert [{"cmd": "snap list"}] + [{"cmd": f"snap install snap{i}"} for i in range(100)] == c["cmds"]
+        assert [{"manager": "SnapManager", "function": "ensureFunc"}] == c["ensures"]
+
     def test_consolidate_features_exclude_task(self):
         j = {"tests": [
             {"suite": "suite", "task_name": "task1", "variant": "a",
@@ -262,14 +408,9 @@ class TestQueryFeatures:
              }
         ]}
         c = query_features.consolidate_system_features(j, exclude_tasks=[query_features.TaskId(suite='suite',task_name="task1")])
-        assert len(c) == 2
-        assert "cmds" in c
-        assert len(c["cmds"]) == 2
-        assert {"cmd": "snap list --all"} in c["cmds"]
-        assert {"cmd": "snap do things"} in c["cmds"]
-        assert "ensures" in c
-        assert len(c["ensures"]) == 1
-        assert {"manager": "SnapManager", "function": "ensureFunc2"} in c["ensures"]
+        assert {"cmds", "ensures"} == c.keys()
+        assert to_multiset([{"cmd": "snap list --all"}, {"cmd": "snap do things"}]) == to_multiset(c["cmds"])
+        assert [{"manager": "SnapManager", "function": "ensureFunc2"}] == c["ensures"]
 
     def test_consolidate_features_include_task(self):
         j = {"tests": [
@@ -282,14 +423,9 @@ class TestQueryFeatures:
              }
         ]}
         c = query_features.consolidate_system_features(j, include_tasks=[query_features.TaskId(suite='suite',task_name="task2")])
-        assert len(c) == 2
-        assert "cmds" in c
-        assert len(c["cmds"]) == 2
-        assert {"cmd": "snap list --all"} in c["cmds"]
-        assert {"cmd": "snap do things"} in c["cmds"]
-        assert "ensures" in c
-        assert len(c["ensures"]) == 1
-        assert {"manager": "SnapManager", "function": "ensureFunc2"} in c["ensures"]
+        assert {"cmds", "ensures"} == c.keys()
+        assert to_multiset([{"cmd": "snap list --all"}, {"cmd": "snap do things"}]) == to_multiset(c["cmds"])
+        assert [{"manager": "SnapManager", "function": "ensureFunc2"}] == c["ensures"]
 
     def test_features_minus(self):
         j = {"cmds": [{"cmd": "snap list --all"}, {"cmd": "snap ack file"},],
@@ -299,13 +435,9 @@ class TestQueryFeatures:
              "ensures": [{"manager": "SnapManager", "function": "ensureFunc2"}],
              }
         minus = query_features.minus(j, k)
-        assert len(minus) == 2
-        assert "cmds" in minus
-        assert "ensures" in minus
-        assert len(minus["cmds"]), 1
-        assert {"cmd": "snap ack file"} in minus["cmds"]
-        assert len(minus["ensures"]) == 1
-        assert {"manager": "SnapManager", "function": "ensureFunc1"} in minus["ensures"]
+        assert {"cmds", "ensures"} == minus.keys()
+        assert [{"cmd": "snap ack file"}] == minus["cmds"]
+        assert [{"manager": "SnapManager", "function": "ensureFunc1"}] == minus["ensures"]
 
 
     def test_subract_features_no_match_snap_types(self):
@@ -394,33 +526,45 @@ class TestQueryFeatures:
         assert set() == tasks
 
     def test_check_dup_none(self):
-        system_json = SystemFeatures(tests=[
-            TaskFeatures(suite='suite',task_name='task1',variant='a',cmds=[Cmd(cmd='cmd1'),Cmd(cmd='cmd2')]),
-            TaskFeatures(suite='suite',task_name='task1',variant='b',cmds=[Cmd(cmd='cmd1'),Cmd(cmd='cmd2')]),
-            TaskFeatures(suite='suite',task_name='task2',variant='',endpoints=[Endpoint(method='GET', path='/v2/snaps')]),
-            TaskFeatures(suite='suite',task_name='task3',variant='',endpoints=[Endpoint(method='GET', path='/v2/snaps')]),
-            TaskFeatures(suite='suite',task_name='task4',variant='b',cmds=[Cmd(cmd='cmd1')]),
-        ])
-        dups = query_features.check_duplicate((system_json['tests'][0], system_json))
+        system_json = self.check_dup_system
+        dup_index = self.check_dup_index
+        dups = query_features.check_duplicate(system_json['tests'][0], dup_index)
         assert dups == None
-        dups = query_features.check_duplicate((system_json['tests'][1], system_json))
+        dups = query_features.check_duplicate(system_json['tests'][1], dup_index)
         assert dups == None
 
     def test_check_dup_no_variant(self):
-        system_json = SystemFeatures(tests=[
-            TaskFeatures(suite='suite',task_name='task1',variant='a',cmds=[Cmd(cmd='cmd1'),Cmd(cmd='cmd2')]),
-            TaskFeatures(suite='suite',task_name='task1',variant='b',cmds=[Cmd(cmd='cmd1'),Cmd(cmd='cmd2')]),
-            TaskFeatures(suite='suite',task_name='task2',variant='',endpoints=[Endpoint(method='GET', path='/v2/snaps')]),
-            TaskFeatures(suite='suite',task_name='task3',variant='',endpoints=[Endpoint(method='GET', path='/v2/snaps')]),
-            TaskFeatures(suite='suite',task_name='task4',variant='b',cmds=[Cmd(cmd='cmd1')]),
-        ])
-        dups = query_features.check_duplicate((system_json['tests'][2], system_json))
+        system_json = self.check_dup_system
+        dup_index = self.check_dup_index
+        dups = query_features.check_duplicate(system_json['tests'][2], dup_index)
         assert query_features.TaskIdVariant(suite='suite',task_name='task2',variant='') == dups
-        dups = query_features.check_duplicate((system_json['tests'][3], system_json))
+        dups = query_features.check_duplicate(system_json['tests'][3], dup_index)
         assert query_features.TaskIdVariant(suite='suite',task_name='task3',variant='') == dups
-        dups = query_features.check_duplicate((system_json['tests'][4], system_json))
+        dups = query_features.check_duplicate(system_json['tests'][4], dup_index)
         assert query_features.TaskIdVariant(suite='suite',task_name='task4',variant='b') == dups
 
+    def test_check_dup_empty_features(self):
+        system_json = SystemFeatures(tests=[
+            TaskFeatures(suite='suite',task_name='task1',variant='',cmds=[Cmd(cmd='cmd1')]),
+            TaskFeatures(suite='suite',task_name='task2',variant='',cmds=[]),
+            TaskFeatures(suite='suite',task_name='task3',variant='',endpoints=[]),
+            TaskFeatures(suite='suite',task_name='task4',variant=''),
+        ])
+        dup_index = query_features.build_dup_index(system_json)
+        dups = query_features.check_duplicate(system_json['tests'][1], dup_index)
+        assert query_features.TaskIdVariant(suite='suite',task_name='task2',variant='') == dups
+        dups = query_features.check_duplicate(system_json['tests'][2], dup_index)
+        assert dups == None
+        dups = query_features.check_duplicate(system_json['tests'][3], dup_index)
+        assert dups == None
+
+    def test_build_dup_index_unserializable(self):
+        system_json = SystemFeatures(tests=[
+            TaskFeatures(suite='suite',task_name='task1',variant='',cmds=[Cmd(cmd=object())]),
+        ])
+        with pytest.raises(TypeError):
+            query_features.build_dup_index(system_json)
+
 
     def test_dup(self):
         data = {'timestamp1': {'system1': {'tests': [
@@ -488,16 +632,16 @@ class TestQueryFeatures:
             with open(file, 'r', encoding='utf-8') as f:
                 assert ref_dict == json.load(f)
 
-        with tempfile.TemporaryDirectory() as tmpdir:
-            query_features.export(retriever, tmpdir, ['timestamp1', 'timestamp2'], None)
-            timestamp1 = os.path.join(tmpdir, 'timestamp1')
-            timestamp2 = os.path.join(tmpdir, 'timestamp2')
-            assert os.path.isdir(timestamp1)
-            assert os.path.isdir(timestamp2)
-            check_equal(os.path.join(timestamp1, 'system1.json'), t1s1_dict)
-            check_equal(os.path.join(timestamp1, 'system2.json'), s2_dict)
-            check_equal(os.path.join(timestamp2, 'system1.json'), t2s1_dict)
-            check_equal(os.path.join(timestamp2, 'system2.json'), s2_dict)
+        tmpdir = self.tmpdir
+        query_features.export(retriever, tmpdir, ['timestamp1', 'timestamp2'], None)
+        timestamp1 = os.path.join(tmpdir, 'timestamp1')
+        timestamp2 = os.path.join(tmpdir, 'timestamp2')
+        assert os.path.isdir(timestamp1)
+        assert os.path.isdir(timestamp2)
+        check_equal(os.path.join(timestamp1, 'system1.json'), t1s1_dict)
+        check_equal(os.path.join(timestamp1, 'system2.json'), s2_dict)
+        check_equal(os.path.join(timestamp2, 'system1.json'), t2s1_dict)
+        check_equal(os.path.join(timestamp2, 'system2.json'), s2_dict)
 
     def test_diff(self):
         data = {'timestamp1': {'system1': {'tests': [
@@ -963,53 +1107,21 @@ class TestQueryFeatures:
 
 
 
-    @patch('argparse.ArgumentParser.parse_args')
-    def test_dirretriever_list(self, parse_args_mock: Mock):
-        data = [
-            {'timestamp': '2025-05-04', 'system': 'system1'},
-            {'timestamp': '2025-05-04', 'system': 'system2'},
-            {'timestamp': '2025-05-05', 'system': 'system2'}
-        ]
-        with DirMocker(data, do_patch_stdout=True) as dm:
-            parse_args_mock.return_value = argparse.Namespace(
-                command='list',
-                file=None,
-                dir=dm.get_dir()
-            )
+    @pytest.mark.parametrize("mocker_class,timestamp_suffix", [("MongoMocker", "T00:00:00"), ("DirMocker", "")])
+    def test_retriever_list(self, mocker_class: str, timestamp_suffix: str):
+        with self.mocker(mocker_class, self.list_data, do_patch_stdout=True) as mocker:
+            self.set_cli_args(mocker, command='list')
             query_features.main()
-            actual = json.loads(dm.get_stdout())
+            actual = json.loads(mocker.get_stdout())
             assert 2 == len(actual)
-            in_actual = {'timestamp': '2025-05-04', 'systems': ['system1', 'system2']} in actual \
-                or {'timestamp': '2025-05-04', 'systems': ['system2', 'system1']} in actual
-            assert in_actual
-            assert {'timestamp': '2025-05-05','systems': ['system2']} in actual
-
-
-    @patch('argparse.ArgumentParser.parse_args')
-    def test_mongoretriever_list(self, parse_args_mock: Mock):
-        data = [
-            {'timestamp': '2025-05-04', 'system': 'system1'},
-            {'timestamp': '2025-05-04', 'system': 'system2'},
-            {'timestamp': '2025-05-05', 'system': 'system2'}
-        ]
-        with MongoMocker(data, do_patch_stdout=True) as mm:
-            parse_args_mock.return_value = argparse.Namespace(
-                command='list',
-                file=StringIO(''),
-                dir=None
-            )
-            query_features.main()
-            actual = json.loads(mm.get_stdout())
-            assert 2, len(actual)
-            in_actual = {'timestamp': '2025-05-04T00:00:00', 'systems': ['system1', 'system2']} in actual \
-                or {'timestamp': '2025-05-04T00:00:00', 'systems': ['system2', 'system1']} in actual
-            assert in_actual
-            assert {'timestamp': '2025-05-05T00:00:00', 'systems': ['system2']} in actual
+            # Mongo stores timestamps as datetimes, which are listed in iso format
+            expected = [{'timestamp': '2025-05-04' + timestamp_suffix, 'systems': ['system1', 'system2']},
+                        {'timestamp': '2025-05-05' + timestamp_suffix, 'systems': ['system2']}]
+            assert to_multiset(expected) == to_multiset(actual)
 
 
     @pytest.mark.parametrize("mocker_class", ["MongoMocker","DirMocker"])
-    @patch('argparse.ArgumentParser.parse_args')
-    def test_retriever_diff_systems(self, parse_args_mock: Mock, mocker_class: str):
+    def test_retriever_diff_systems(self, mocker_class: str):
         data = [
             {'timestamp': '2025-05-04', 'system': 'system', 'tests': [
                 {'cmds': [{'cmd': 'a'}, {'cmd': 'b'}], 'endpoints': [{'1': 'a'}]},
@@ -1021,13 +1133,11 @@ class TestQueryFeatures:
                 {'cmds': [{'cmd': 'e'}], 'endpoints': [{'5': 'd'}]}
             ]}
         ]
-        Mocker = globals()[mocker_class]
-        with Mocker(data, do_patch_stdout=True) as mocker:
-            parse_args_mock.return_value = argparse.Namespace(
+        with self.mocker(mocker_class, data, do_patch_stdout=True) as mocker:
+            self.set_cli_args(
+                mocker,
                 command='diff',
                 diff_cmd='systems',
-                file=StringIO('') if mocker_class == "MongoMocker" else None,
-                dir=mocker.get_dir() if mocker_class == "DirMocker" else None,
                 timestamp1='2025-05-04',
                 system1='system',
                 timestamp2='2025-05-05',
@@ -1044,8 +1154,7 @@ class TestQueryFeatures:
 
 
     @pytest.mark.parametrize("mocker_class", ["MongoMocker","DirMocker"])
-    @patch('argparse.ArgumentParser.parse_args')
-    def test_retriever_diff_all(self, parse_args_mock: Mock, mocker_class: str):
+    def test_retriever_diff_all(self, mocker_class: str):
         data = [
             {'timestamp': '2025-05-04', 'system': 'system', 'tests': [
                 {'cmds': [Cmd(cmd='a'), Cmd(cmd='b')], 'endpoints': [Endpoint(method='a',path='/a')]},
@@ -1070,13 +1179,11 @@ class TestQueryFeatures:
                 'ensures': [Ensure(manager='mgr',function='func')]
             }
         ]
-        Mocker = globals()[mocker_class]
-        with Mocker(data, do_patch_stdout=True) as mocker:
-            parse_args_mock.return_value = argparse.Namespace(
+        with self.mocker(mocker_class, data, do_patch_stdout=True) as mocker:
+            self.set_cli_args(
+                mocker,
                 command='diff',
                 diff_cmd='all-features',
-                file=StringIO('') if mocker_class == "MongoMocker" else None,
-                dir=mocker.get_dir() if mocker_class == "DirMocker" else None,
                 timestamp='2025-05-04',
                 system='system',
                 remove_failed=False
@@ -1090,8 +1197,7 @@ class TestQueryFeatures:
 
 
     @pytest.mark.parametrize("mocker_class", ["MongoMocker","DirMocker"])
-    @patch('argparse.ArgumentParser.parse_args')
-    def test_retriever_dup(self, parse_args_mock: Mock, mocker_class: str):
+    def test_retriever_dup(self, mocker_class: str):
         data = [{'timestamp': '2025-05-04', 'system': 'system', 'tests': [
             TaskFeatures(task_name='task1', suite='suite1', variant='', cmds=[{'cmd': 'a'}, {'cmd': 'b'}], endpoints=[{'1': 'a'}]),
             TaskFeatures(task_name='task2', suite='suite1', variant='', cmds=[{'cmd': 'd'}], endpoints=[{'5': 'd'}]),
@@ -1099,102 +1205,70 @@ class TestQueryFeatures:
             TaskFeatures(task_name='task4', suite='suite1', variant='v1', endpoints=[{'1': 'a'}])
         ]}
         ]
-        Mocker = globals()[mocker_class]
-        with Mocker(data, do_patch_stdout=True) as mocker:
-            parse_args_mock.return_value = argparse.Namespace(
+        with self.mocker(mocker_class, data, do_patch_stdout=True) as mocker:
+            self.set_cli_args(
+                mocker,
                 command='dup',
-                file=StringIO('') if mocker_class == "MongoMocker" else None,
-                dir=mocker.get_dir() if mocker_class == "DirMocker" else None,
                 timestamp='2025-05-04',
                 system='system',
                 remove_failed=False,
             )
             query_features.main()
             actual = json.loads(mocker.get_stdout())
-            assert 2 == len(actual)
-            assert str(TaskIdVariant(suite='suite2', task_name='task3', variant='')) in actual
-            assert str(TaskIdVariant(suite='suite1', task_name='task4', variant='v1')) in actual
+            expected = [str(TaskIdVariant(suite='suite2', task_name='task3', variant='')),
+                        str(TaskIdVariant(suite='suite1', task_name='task4', variant='v1'))]
+            assert to_multiset(expected) == to_multiset(actual)
 
 
     @pytest.mark.parametrize("mocker_class", ["MongoMocker","DirMocker"])
-    @patch('argparse.ArgumentParser.parse_args')
-    def test_retriever_export(self, parse_args_mock: Mock, mocker_class: str):
-        data = [
-            {'timestamp': '2025-05-04', 'system': 'system1', 'tests': [
-                TaskFeatures(task_name='task1', suite='suite1', variant='', cmds=[{'cmd': 'a'}, {'cmd': 'b'}], endpoints=[{'1': 'a'}]),
-                TaskFeatures(task_name='task2', suite='suite1', variant='', cmds=[{'cmd': 'd'}], endpoints=[{'5': 'd'}])
-            ]},
-            {'timestamp': '2025-05-05', 'system': 'system2', 'tests': [
-                TaskFeatures(task_name='task1', suite='suite1', variant='', cmds=[{'cmd': 'c'}, {'cmd': 'd'}], endpoints=[{'1': 'a'}]),
-                TaskFeatures(task_name='task2', suite='suite1', variant='', cmds=[{'cmd': 'd'}], endpoints=[{'2': 'q'}])
-            ]},
-            {'timestamp': '2025-05-06', 'system': 'system3', 'tests': [
-                TaskFeatures(task_name='task1', suite='suite1', variant='', cmds=[{'cmd': 'a'}])
-            ]},
-        ]
-        Mocker = globals()[mocker_class]
-        with Mocker(data) as mocker:
-            with tempfile.TemporaryDirectory() as tmpdir:
-                parse_args_mock.return_value = argparse.Namespace(
-                    command='export',
-                    file=StringIO('') if mocker_class == "MongoMocker" else None,
-                    dir=mocker.get_dir() if mocker_class == "DirMocker" else None,
-                    timestamps=['2025-05-04', '2025-05-05'],
-                    systems=None,
-                    output=tmpdir,
-                )
-                with patch('sys.stderr', new=StringIO()) as stderr_patch:
-                    query_features.main()
-                    assert stderr_patch.getvalue().startswith('could not find all features at timestamp 2025-05-04')
-
-                assert os.path.isdir(os.path.join(tmpdir, '2025-05-04'))
-                assert os.path.isdir(os.path.join(tmpdir, '2025-05-05'))
-                assert os.path.isfile(os.path.join(tmpdir, '2025-05-04', 'system1.json'))
-                assert os.path.isfile(os.path.join(tmpdir, '2025-05-05', 'system2.json'))
+    def test_retriever_export(self, mocker_class: str):
+        with self.mocker(mocker_class, self.export_data) as mocker:
+            tmpdir = os.path.join(self.tmpdir, 'output')
+            self.set_cli_args(
+                mocker,
+                command='export',
+                timestamps=['2025-05-04', '2025-05-05'],
+                systems=None,
+                output=tmpdir,
+            )
+            stderr = StringIO()
+            with redirect_stderr(stderr):
+                query_features.main()
+            assert stderr.getvalue().startswith('could not find all features at timestamp 2025-05-04')
+
+            assert os.path.isdir(os.path.join(tmpdir, '2025-05-04'))
+            assert os.path.isdir(os.path.join(tmpdir, '2025-05-05'))
+            assert os.path.isfile(os.path.join(tmpdir, '2025-05-04', 'system1.json'))
+            assert os.path.isfile(os.path.join(tmpdir, '2025-05-05', 'system2.json'))
 
 
     @pytest.mark.parametrize("mocker_class", ["MongoMocker","DirMocker"])
-    @patch('argparse.ArgumentParser.parse_args')
-    def test_retriever_export_with_all(self, parse_args_mock: Mock, mocker_class: str):
-        data = [
-            {'timestamp': '2025-05-04', 'system': 'system1', 'tests': [
-                TaskFeatures(task_name='task1', suite='suite1', variant='', cmds=[{'cmd': 'a'}, {'cmd': 'b'}], endpoints=[{'1': 'a'}]),
-                TaskFeatures(task_name='task2', suite='suite1', variant='', cmds=[{'cmd': 'd'}], endpoints=[{'5': 'd'}])
-            ]},
-            {'timestamp': '2025-05-05', 'system': 'system2', 'tests': [
-                TaskFeatures(task_name='task1', suite='suite1', variant='', cmds=[{'cmd': 'c'}, {'cmd': 'd'}], endpoints=[{'1': 'a'}]),
-                TaskFeatures(task_name='task2', suite='suite1', variant='', cmds=[{'cmd': 'd'}], endpoints=[{'2': 'q'}])
-            ]},
-            {'timestamp': '2025-05-06', 'system': 'system3', 'tests': [
-                TaskFeatures(task_name='task1', suite='suite1', variant='', cmds=[{'cmd': 'a'}])
-            ]},
+    def test_retriever_export_with_all(self, mocker_class: str):
+        data = self.export_data + [
             {'timestamp': '2025-05-04', 'all_features': True, 'cmds': [{'cmd': 'a'},{'cmd': 'b'},{'cmd': 'c'},{'cmd': 'd'}]},
             {'timestamp': '2025-05-05', 'all_features': True, 'cmds': [{'cmd': 'a'},{'cmd': 'b'},{'cmd': 'c'},{'cmd': 'd'}]},
         ]
-        Mocker = globals()[mocker_class]
-        with Mocker(data) as mocker:
-            with tempfile.TemporaryDirectory() as tmpdir:
-                parse_args_mock.return_value = argparse.Namespace(
-                    command='export',
-                    file=StringIO('') if mocker_class == "MongoMocker" else None,
-                    dir=mocker.get_dir() if mocker_class == "DirMocker" else None,
-                    timestamps=['2025-05-04', '2025-05-05'],
-                    systems=None,
-                    output=tmpdir,
-                )
-                query_features.main()
+        with self.mocker(mocker_class, data) as mocker:
+            tmpdir = os.path.join(self.tmpdir, 'output')
+            self.set_cli_args(
+                mocker,
+                command='export',
+                timestamps=['2025-05-04', '2025-05-05'],
+                systems=None,
+                output=tmpdir,
+            )
+            query_features.main()
 
-                assert os.path.isdir(os.path.join(tmpdir, '2025-05-04'))
-                assert os.path.isdir(os.path.join(tmpdir, '2025-05-05'))
-                assert os.path.isfile(os.path.join(tmpdir, '2025-05-04', 'system1.json'))
-                assert os.path.isfile(os.path.join(tmpdir, '2025-05-05', 'system2.json'))
-                assert os.path.isfile(os.path.join(tmpdir, '2025-05-04', 'all-features.json'))
-                assert os.path.isfile(os.path.join(tmpdir, '2025-05-05', 'all-features.json'))
+            assert os.path.isdir(os.path.join(tmpdir, '2025-05-04'))
+            assert os.path.isdir(os.path.join(tmpdir, '2025-05-05'))
+            assert os.path.isfile(os.path.join(tmpdir, '2025-05-04', 'system1.json'))
+            assert os.path.isfile(os.path.join(tmpdir, '2025-05-05', 'system2.json'))
+            assert os.path.isfile(os.path.join(tmpdir, '2025-05-04', 'all-features.json'))
+            assert os.path.isfile(os.path.join(tmpdir, '2025-05-05', 'all-features.json'))
 
 
     @pytest.mark.parametrize("mocker_class", ["MongoMocker","DirMocker"])
-    @patch('argparse.ArgumentParser.parse_args')
-    def test_retriever_feat_sys(self, parse_args_mock: Mock, mocker_class: str):
+    def test_retriever_feat_sys(self, mocker_class: str):
         data = [
             {'timestamp': '2025-05-04', 'system': 'system1', 'tests': [
                 TaskFeatures(task_name='task1', suite='suite1', variant='', cmds=[{'cmd': 'a'}, {'cmd': 'b'}], endpoints=[{'1': 'a'}], success=True),
@@ -1202,13 +1276,11 @@ class TestQueryFeatures:
                 TaskFeatures(task_name='task3', suite='suite2', variant='', cmds=[{'cmd': 'c'}], success=False)
             ]}
         ]
-        Mocker = globals()[mocker_class]
-        with Mocker(data, do_patch_stdout=True) as mocker:
-            parse_args_mock.return_value = argparse.Namespace(
+        with self.mocker(mocker_class, data, do_patch_stdout=True) as mocker:
+            self.set_cli_args(
+                mocker,
                 command='feat',
                 features_cmd='sys',
-                file=StringIO('') if mocker_class == "MongoMocker" else None,
-                dir=mocker.get_dir() if mocker_class == "DirMocker" else None,
                 timestamp='2025-05-04',
                 system='system1',
                 suite=None,
@@ -1225,8 +1297,7 @@ class TestQueryFeatures:
 
 
     @pytest.mark.parametrize("mocker_class", ["MongoMocker","DirMocker"])
-    @patch('argparse.ArgumentParser.parse_args')
-    def test_retriever_feat_all(self, parse_args_mock: Mock, mocker_class: str):
+    def test_retriever_feat_all(self, mocker_class: str):
         data = [
             {'timestamp': '2025-05-04', 'system': 'system', 'tests': [
                 {'cmds': [{'cmd': 'a'}, {'cmd': 'b'}], 'endpoints': [{'1': 'a'}]},
@@ -1237,13 +1308,11 @@ class TestQueryFeatures:
                 'endpoints': [{'1': 'a'},{'1': 'b'},{'2': 'a'},{'5': 'd'}]
             }
         ]
-        Mocker = globals()[mocker_class]
-        with Mocker(data, do_patch_stdout=True) as mocker:
-            parse_args_mock.return_value = argparse.Namespace(
+        with self.mocker(mocker_class, data, do_patch_stdout=True) as mocker:
+            self.set_cli_args(
+                mocker,
                 command='feat',
                 features_cmd='all',
-                file=StringIO('') if mocker_class == "MongoMocker" else None,
-                dir=mocker.get_dir() if mocker_class == "DirMocker" else None,
                 timestamp='2025-05-04',
                 system='system1',
                 remove_failed=True
@@ -1257,8 +1326,7 @@ class TestQueryFeatures:
 
 
     @pytest.mark.parametrize("mocker_class", ["MongoMocker","DirMocker"])
-    @patch('argparse.ArgumentParser.parse_args')
-    def test_retriever_feat_find(self, parse_args_mock: Mock, mocker_class: str):
+    def test_retriever_feat_find(self, mocker_class: str):
         data = [
             {'timestamp': '2025-05-04', 'system': 'system1', 'tests': [
                 TaskFeatures(success=True, task_name='task1', suite='suite1', variant='', cmds=[{'cmd': 'a'}, {'cmd': 'b'}], endpoints=[{'1': 'a'}]),
@@ -1273,13 +1341,11 @@ class TestQueryFeatures:
                 'endpoints': [{'1': 'a'},{'1': 'b'},{'2': 'a'},{'5': 'd'}]
             }
         ]
-        Mocker = globals()[mocker_class]
-        with Mocker(data, do_patch_stdout=True) as mocker:
-            parse_args_mock.return_value = argparse.Namespace(
+        with self.mocker(mocker_class, data, do_patch_stdout=True) as mocker:
+            self.set_cli_args(
+                mocker,
                 command='feat',
                 features_cmd='find',
-                file=StringIO('') if mocker_class == "MongoMocker" else None,
-                dir=mocker.get_dir() if mocker_class == "DirMocker" else None,
                 timestamp='2025-05-04',
                 feat='{"cmd":"d"}',
                 system=None,
@@ -1295,8 +1361,7 @@ class TestQueryFeatures:
 
 
     @pytest.mark.parametrize("mocker_class", ["MongoMocker","DirMocker"])
-    @patch('argparse.ArgumentParser.parse_args')
-    def test_retriever_feat_cover(self, parse_args_mock: Mock, mocker_class: str):
+    def test_retriever_feat_cover(self, mocker_class: str):
         data = [
             {'timestamp': '2025-05-04', 'system': 'system1', 'tests': [
                 TaskFeatures(success=True, task_name='task1', suite='suite1', variant='', runtime=180,
@@ -1307,13 +1372,11 @@ class TestQueryFeatures:
                              changes=[{'kind': 'install-snap', 'snap_types': ['app']}]),
             ]},
         ]
-        Mocker = globals()[mocker_class]
-        with Mocker(data, do_patch_stdout=True) as mocker:
-            parse_args_mock.return_value = argparse.Namespace(
+        with self.mocker(mocker_class, data, do_patch_stdout=True) as mocker:
+            self.set_cli_args(
+                mocker,
                 command='feat',
                 features_cmd='cover',
-                file=StringIO('') if mocker_class == "MongoMocker" else None,
-                dir=mocker.get_dir() if mocker_class == "DirMocker" else None,
                 timestamp='2025-05-04',
                 system='system1',
                 max_minutes=8,
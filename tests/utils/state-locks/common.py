@@ -2,6 +2,10 @@
 
 from __future__ import annotations
 
+from itertools import islice
+import sys
+from typing import Iterable, Iterator
+
 
 class LockOpTrace:
     """
@@ -10,49 +14,91 @@ class LockOpTrace:
     the trace.
     """
 
+    __slots__ = ("lines", "_key", "_hash")
+
     def __init__(self, lines: list[str]):
-        self.lines = lines
-        self.hash = hash(str(self))
+        # The same stack frames show up in many traces, interning keeps a
+        # single copy of each line and lets comparisons match by identity
+        self.lines = [sys.intern(line) for line in lines]
+        # computed on first use, many traces are never hashed or compared
+        self._key = None
+        self._hash = None
 
     def get_trace_lines(self) -> list[str]:
         return self.lines
 
+    # The part has to be found within a single line
     def match(self, part: str) -> bool:
-        for line in self.lines:
-            if part in line:
-                return True
+        return any(part in line for line in self.lines)
 
-        return False
+    # The trace as shown by print, title included
+    def format(self) -> str:
+        return "{}\n\n{}\n\n".format("-" * 20 + "TRACE" + "-" * 20, self)
 
     def print(self):
-        print("-" * 20 + "TRACE" + "-" * 20)
-        print("")
-        print(self)
-        print("")
+        print(self.format(), end="")
 
     def __str__(self) -> str:
         return "".join(self.lines).rstrip()
 
+    def _get_key(self) -> tuple[str, ...]:
+        # Same content as str(self) without joining the lines: trailing
+        # blank lines are dropped and the last line is right stripped
+        if self._key is None:
+            end = len(self.lines)
+            while end > 0 and not self.lines[end - 1].strip():
+                end -= 1
+            if end == 0:
+                self._key = ()
+            else:
+                self._key = (*self.lines[:end - 1], self.lines[end - 1].rstrip())
+        return self._key
+
     def __hash__(self) -> int:
-        return self.hash
+        if self._hash is None:
+            self._hash = hash(self._get_key())
+        return self._hash
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, LockOpTrace):
             # don't attempt to compare against unrelated types
             return NotImplemented
 
-        return self.hash == other.hash
+        # the hashes rule out most mismatches, the keys rule out collisions
+        return hash(self) == hash(other) and self._get_key() == other._get_key()
+
+
+"""
+Generic function used to split a list of strings in consecutive sections.
+The first section begins at start, and every following element which starts
+with the prefix passed as parameter begins a new section.
+"""
+
+
+def split_sections(lines: list[str], start: int, prefix: str) -> list[list[str]]:
+    if start >= len(lines):
+        return []
+    bounds = [start]
+    bounds.extend(
+        index for index, line in enumerate(islice(lines, start + 1, None), start + 1)
+        if line.startswith(prefix))
+    bounds.append(len(lines))
+    return [lines[begin:end] for begin, end in zip(bounds, bounds[1:])]
 
 
 """
-Generic function used to iterate a list of strings until it is found an
-element which starts with the prefix passed as parameter. The function
-returns the index for the first match, and -1 in case there isn't any.
+Same as split_sections for a stream of strings, such as an open file. The
+first section begins at the first element and sections are produced as soon
+as they are complete, so the whole stream is never held in memory at once.
 """
 
 
-def get_next_match(lines: list[str], start: int, prefix: str) -> int:
-    for current_line in range(start + 1, len(lines)):
-        if lines[current_line].startswith(prefix):
-            return current_line
-    return -1
+def iter_sections(lines: Iterable[str], prefix: str) -> Iterator[list[str]]:
+    section = []
+    for line in lines:
+        if section and line.startswith(prefix):
+            yield section
+            section = []
+        section.append(line)
+    if section:
+        yield section
@@ -3,11 +3,12 @@
 from __future__ import annotations
 
 import argparse
+from operator import attrgetter
 import re
 import sys
 from typing import IO
 
-from common import LockOpTrace, get_next_match
+from common import LockOpTrace, iter_sections, split_sections
 
 
 class LockOp:
@@ -16,27 +17,25 @@ class LockOp:
     and times (held and wait times). It is tied to the LockOpTrace class.
     """
 
+    __slots__ = ("trace", "header", "held_time", "wait_time")
+
+    # Both times are read in a single scan of the header
+    TIMES_RE = re.compile(r"held: (\d+) ms.*?wait (\d+) ms")
+
     def __init__(self, lines: list[str]):
         self.trace = LockOpTrace(lines[1:])
         self.header = lines[0]
         self.held_time = 0
         self.wait_time = 0
-        self._calc_held_ms(self.header)
-        self._calc_wait_ms(self.header)
+        self._calc_times_ms(self.header)
 
-    def _calc_held_ms(self, line: str) -> int:
-        match = re.search(".*held: (.+?) ms.*", line)
+    def _calc_times_ms(self, line: str) -> None:
+        match = self.TIMES_RE.search(line)
         if match:
             self.held_time = int(match.group(1))
+            self.wait_time = int(match.group(2))
         else:
-            raise ValueError("No held time in line: {}".format(line))
-
-    def _calc_wait_ms(self, line: str) -> int:
-        match = re.search(".*wait (.+?) ms.*", line)
-        if match:
-            self.wait_time = int(match.group(1))
-        else:
-            raise ValueError("No wait time in line: {}".format(line))
+            raise ValueError("No held and wait times in line: {}".format(line))
 
     def get_held_time(self) -> int:
         return self.held_time
@@ -58,60 +57,62 @@ class LocksGroup:
     LOCK_PREFIX = "### "
 
     locks: list[LockOp]
+    traces: list[LockOpTrace]
+    locks_by_trace: dict[LockOpTrace, LockOp]
 
     def __init__(self, lines: list[str]):
         self.lines = lines
         self.header = self.lines[0]
         self.locks = []
+        self.traces = []
+        self.locks_by_trace = {}
 
         self._read()
 
+    # Each lock begins with the lock prefix, after the header
     def _read(self) -> None:
-        current_line = 1
-        while current_line < len(self.lines):
-            lock_lines = self._current_lock(current_line)
-            if len(lock_lines) == 0:
-                raise RuntimeError("Error parsing lock")
-
-            self.locks.append(LockOp(lock_lines))
-            current_line = current_line + len(lock_lines)
+        for lock_lines in split_sections(self.lines, 1, self.LOCK_PREFIX):
+            lock = LockOp(lock_lines)
+            self.locks.append(lock)
+            self.traces.append(lock.get_trace())
+            # The first lock with a given trace is the one reported
+            self.locks_by_trace.setdefault(lock.get_trace(), lock)
 
     def __str__(self) -> str:
         return "".join(self.lines)
 
-    # This function works to detect the current test or project
-    def _current_lock(self, start_line: int) -> list[str]:
-        next_match = get_next_match(self.lines, start_line, self.LOCK_PREFIX)
-        if next_match == -1:
-            return self.lines[start_line:len(self.lines)]
-        return self.lines[start_line:next_match]
-
     def get_name(self) -> str:
         return self.header
 
     def get_locks(self) -> list[LockOp]:
         return self.locks
 
+    # A copy, so callers can't change the traces of the group
     def get_traces(self) -> list[LockOpTrace]:
-        traces = []
-        for lock in self.locks:
-            traces.append(lock.get_trace())
-        return traces
+        return list(self.traces)
 
     def get_lock_held_time(self, trace: LockOpTrace) -> int:
-        for lock in self.locks:
-            if lock.get_trace() == trace:
-                return lock.get_held_time()
+        lock = self.locks_by_trace.get(trace)
+        if lock is not None:
+            return lock.get_held_time()
 
         return 0
 
     def get_lock_wait_time(self, trace: LockOpTrace) -> int:
-        for lock in self.locks:
-            if lock.get_trace() == trace:
-                return lock.get_wait_time()
+        lock = self.locks_by_trace.get(trace)
+        if lock is not None:
+            return lock.get_wait_time()
 
         return 0
 
+    # Held and wait times for the trace with a single lookup
+    def get_lock_times(self, trace: LockOpTrace) -> tuple[int, int]:
+        lock = self.locks_by_trace.get(trace)
+        if lock is not None:
+            return lock.get_held_time(), lock.get_wait_time()
+
+        return 0, 0
+
 
 class GroupTimes:
     """
@@ -119,6 +120,9 @@ class GroupTimes:
     held and wait times for each lock trace.
     """
 
+    # One instance per lock in the file, keep them small
+    __slots__ = ("group_name", "held_time", "wait_time")
+
     def __init__(self, group_name: str, held_time: int, wait_time: int):
         self.group_name = group_name
         self.held_time = held_time
@@ -146,59 +150,56 @@ class LockTraceManager:
     def __init__(self, traces: dict[LockOpTrace, list[GroupTimes]]):
         self.traces = traces
 
-    # Filter the times for each trace
+    # Filter the times for each trace, the traces and their lists of times
+    # are updated in place
     def filter(self, held_time: int, wait_time: int) -> None:
-        filtered_traces = dict[LockOpTrace, list[GroupTimes]]()
-        for trace, times in self.traces.items():
-            filtered_times = [
+        for trace in list(self.traces):
+            times = self.traces[trace]
+            times[:] = [
                 time
                 for time in times
-                if time.get_held_time() >= held_time
-                and time.get_wait_time() >= wait_time
+                if time.held_time >= held_time
+                and time.wait_time >= wait_time
             ]
-            if len(filtered_times) > 0:
-                filtered_traces[trace] = filtered_times
-
-        self.traces = filtered_traces
+            if not times:
+                del self.traces[trace]
 
     # Keep the traces that match with the params
     def match(self, match_names: list[str]) -> None:
-        filtered_traces = dict[LockOpTrace, list[GroupTimes]]()
-        for trace, times in self.traces.items():
-            for match_name in match_names:
-                if trace.match(match_name):
-                    filtered_traces[trace] = times
-
-        self.traces = filtered_traces
+        self.traces = {
+            trace: times
+            for trace, times in self.traces.items()
+            if any(trace.match(match_name) for match_name in match_names)
+        }
 
     # print the traces with their times for each test
     def print(
         self, sort_held_time: bool, sort_wait_time: bool, list_traces: bool
     ) -> None:
+        sort_key = None
         if sort_held_time:
-            for trace, times in self.traces.items():
-                self.traces[trace] = sorted(
-                    times, key=lambda x: x.get_held_time(), reverse=True
-                )
-        if sort_wait_time:
-            for trace, times in self.traces.items():
-                self.traces[trace] = sorted(
-                    times, key=lambda x: x.get_held_time(), reverse=True
-                )
-
+            sort_key = attrgetter("held_time")
+        elif sort_wait_time:
+            sort_key = attrgetter("wait_time")
+        if sort_key:
+            for times in self.traces.values():
+                times.sort(key=sort_key, reverse=True)
+
+        # The output is built first and written at once
+        output = []
         for trace, times in self.traces.items():
-            trace.print()
+            output.append(trace.format())
 
             if not list_traces:
                 for time in times:
-                    print(
-                        "{} held: {} ms, wait: {} ms".format(
-                            time.get_group_name(),
-                            time.get_held_time(),
-                            time.get_wait_time(),
+                    output.append(
+                        "{} held: {} ms, wait: {} ms\n".format(
+                            time.group_name, time.held_time, time.wait_time
                         )
                     )
-                print("")
+                output.append("\n")
+
+        sys.stdout.write("".join(output))
 
 
 class LocksFileReader:
@@ -212,43 +213,30 @@ class LocksFileReader:
     PROJECT_PREFIX = "###START: SNAPD PROJECT"
     TEST_PREFIX = "###START:"
 
-    lines: list[str]
     groups: list[LocksGroup]
 
     def __init__(self, locks_file: IO[str]):
-        self.lines = []
         self.groups = []
 
         self._read(locks_file)
 
+    # The file is read as a stream, one test at a time
     def _read(self, locks_file: IO[str]) -> None:
-        self.lines = locks_file.readlines()
+        groups_lines = iter_sections(locks_file, self.TEST_PREFIX)
 
-        current_line = 0
-        if not self._is_project(self.lines[current_line]):
-            print("First time expected to be the project start.")
-            sys.exit(1)
+        project_lines = next(groups_lines, None)
+        if not project_lines or not self._is_project(project_lines[0]):
+            raise ValueError("First line expected to be the project start.")
+        self.groups.append(LocksGroup(project_lines))
 
         # Read the tests
-        while current_line < len(self.lines):
-            group_lines = self._current_group(current_line)
-            if len(group_lines) == 0:
-                raise RuntimeError("Error parsing test.")
-
+        for group_lines in groups_lines:
             self.groups.append(LocksGroup(group_lines))
-            current_line = current_line + len(group_lines)
 
     # Indicates if the line is the project declaration
     def _is_project(self, line: str) -> bool:
         return line.startswith(self.PROJECT_PREFIX)
 
-    # This function works to detect the current test or project
-    def _current_group(self, start_line: int) -> list[str]:
-        next_match = get_next_match(self.lines, start_line, self.TEST_PREFIX)
-        if next_match == -1:
-            return self.lines[start_line:len(self.lines)]
-        return self.lines[start_line:next_match]
-
     # Retrieve the test lines
     def get_test(self, test: str) -> str:
         for group in self.groups:
@@ -261,21 +249,13 @@ class LocksFileReader:
     # For each trace, there is a list with the times for each test where
     # the trace appears
     def get_traces_times(self) -> dict[LockOpTrace, list[GroupTimes]]:
-        traces = dict[LockOpTrace, list[GroupTimes]]()
+        traces: dict[LockOpTrace, list[GroupTimes]] = {}
         for group in self.groups:
-            group_traces = group.get_traces()
-            for trace in group_traces:
-                group_time = GroupTimes(
-                    group.get_name(),
-                    group.get_lock_held_time(trace),
-                    group.get_lock_wait_time(trace),
-                )
-                if trace not in traces.keys():
-                    traces[trace] = list[GroupTimes]()
-                try:
-                    traces[trace].append(group_time)
-                except KeyError:
-                    traces[trace] = list[GroupTimes]([group_time])
+            group_name = group.get_name()
+            for trace in group.get_traces():
+                held_time, wait_time = group.get_lock_times(trace)
+                group_time = GroupTimes(group_name, held_time, wait_time)
+                traces.setdefault(trace, []).append(group_time)
 
         return traces
 
@@ -358,7 +338,11 @@ if __name__ == "__main__":
         print("state-lock-filter: define just 1 sorting (by held/wait times)")
         sys.exit(1)
 
-    locks_reader = LocksFileReader(args.locks_file)
+    try:
+        locks_reader = LocksFileReader(args.locks_file)
+    except ValueError as err:
+        print("state-lock-filter: {}".format(err))
+        sys.exit(1)
     if args.test:
         print(locks_reader.get_test(args.test))
         sys.exit()
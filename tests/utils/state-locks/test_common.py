@@ -2,6 +2,8 @@ import unittest
 
 from common import (
     LockOpTrace,
+    iter_sections,
+    split_sections,
 )
 
 
@@ -16,10 +18,57 @@ class TestLockOpTrace(unittest.TestCase):
     def test_match(self):
         self.assertTrue(self.trace.match("line 2"))
         self.assertFalse(self.trace.match("line 4"))
+        self.assertTrue(self.trace.match("line 3\n"))
+        # Parts spanning more than one line don't match
+        self.assertFalse(self.trace.match("line 1\nline 2"))
+        self.assertFalse(self.trace.match("1\nline"))
 
     def test_str(self):
         self.assertEqual(str(self.trace), "line 1\nline 2\nline 3")
 
+    def test_format(self):
+        self.assertEqual(
+            self.trace.format(),
+            "--------------------TRACE--------------------\n\n"
+            "line 1\nline 2\nline 3\n\n",
+        )
+
     def test_eq(self):
         other_trace = LockOpTrace(self.lines)
         self.assertEqual(self.trace, other_trace)
+
+    def test_eq_ignores_trailing_whitespace(self):
+        other_trace = LockOpTrace(["line 1\n", "line 2\n", "line 3  \n", "\n"])
+        self.assertEqual(self.trace, other_trace)
+        self.assertEqual(hash(self.trace), hash(other_trace))
+
+    def test_not_eq(self):
+        other_trace = LockOpTrace(["line 1\n", "line 3\n", "line 2\n"])
+        self.assertNotEqual(self.trace, other_trace)
+        self.assertNotEqual(LockOpTrace(["\n"]), other_trace)
+        self.assertEqual(LockOpTrace([]), LockOpTrace(["\n"]))
+
+
+class TestSplitSections(unittest.TestCase):
+    def test_split_sections(self):
+        lines = ["header\n", "### a\n", "line 1\n", "### b\n", "### c\n", "line 2\n"]
+        self.assertEqual(
+            split_sections(lines, 1, "### "),
+            [["### a\n", "line 1\n"], ["### b\n"], ["### c\n", "line 2\n"]],
+        )
+        # The first section begins at start whatever its first line is
+        self.assertEqual(
+            split_sections(lines, 0, "### "),
+            [["header\n"], ["### a\n", "line 1\n"], ["### b\n"], ["### c\n", "line 2\n"]],
+        )
+        self.assertEqual(split_sections(lines, 5, "### "), [["line 2\n"]])
+        self.assertEqual(split_sections(lines, 6, "### "), [])
+
+    def test_iter_sections(self):
+        lines = ["header\n", "### a\n", "line 1\n", "### b\n", "### c\n", "line 2\n"]
+        self.assertEqual(
+            list(iter_sections(iter(lines), "### ")),
+            split_sections(lines, 0, "### "),
+        )
+        self.assertEqual(list(iter_sections(iter(lines[1:]), "### ")), split_sections(lines, 1, "### "))
+        self.assertEqual(list(iter_sections(iter([]), "### ")), [])
@@ -1,7 +1,12 @@
+import os
+import subprocess
+import sys
+import tempfile
 import unittest
+from contextlib import redirect_stdout
 from io import StringIO
 
-from common import LockOpTrace, get_next_match
+from common import LockOpTrace
 
 from filter import LockOp, LocksGroup, GroupTimes, LockTraceManager, LocksFileReader
 
@@ -21,6 +26,12 @@ class TestLockOp(unittest.TestCase):
         expected_trace = LockOpTrace(["line 1\n", "line 2\n"])
         self.assertEqual(self.lock_op.get_trace(), expected_trace)
 
+    def test_missing_times(self):
+        with self.assertRaises(ValueError):
+            LockOp(["header held: 10 ms\n", "line 1\n"])
+        with self.assertRaises(ValueError):
+            LockOp(["header wait 5 ms\n", "line 1\n"])
+
 
 class TestLocksGroup(unittest.TestCase):
     def setUp(self):
@@ -42,6 +53,8 @@ class TestLocksGroup(unittest.TestCase):
 
     def test_get_traces(self):
         self.assertEqual(len(self.group.get_traces()), 2)
+        self.group.get_traces().clear()
+        self.assertEqual(len(self.group.get_traces()), 2)
 
     def test_get_lock_held_time(self):
         trace = self.group.get_traces()[0]
@@ -51,6 +64,22 @@ class TestLocksGroup(unittest.TestCase):
         trace = self.group.get_traces()[0]
         self.assertEqual(self.group.get_lock_wait_time(trace), 5)
 
+    def test_get_lock_times_repeated_trace(self):
+        # The times of the first lock with the trace are reported
+        group = LocksGroup(self.lines + [
+            "### Lock 1 header: held: 30 ms wait 15 ms\n",
+            "line 1\n",
+            "line 2\n",
+        ])
+        trace = group.get_traces()[2]
+        self.assertEqual(group.get_lock_held_time(trace), 10)
+        self.assertEqual(group.get_lock_wait_time(trace), 5)
+        unknown = LockOpTrace(["line 4\n"])
+        self.assertEqual(group.get_lock_held_time(unknown), 0)
+        self.assertEqual(group.get_lock_wait_time(unknown), 0)
+        self.assertEqual(group.get_lock_times(trace), (10, 5))
+        self.assertEqual(group.get_lock_times(unknown), (0, 0))
+
 
 class TestGroupTimes(unittest.TestCase):
     def setUp(self):
@@ -78,12 +107,55 @@ class TestLockTraceManager(unittest.TestCase):
         self.manager.filter(held_time=15, wait_time=3)
         self.assertEqual(len(self.manager.traces), 0)
 
+    def test_filter_times(self):
+        trace = LockOpTrace(["line 1\n", "line 2\n"])
+        manager = LockTraceManager({trace: [
+            GroupTimes("Group 1", 10, 5),
+            GroupTimes("Group 2", 20, 1),
+            GroupTimes("Group 3", 30, 10),
+        ]})
+        manager.filter(held_time=15, wait_time=3)
+        self.assertEqual(len(manager.traces), 1)
+        self.assertEqual(
+            [time.get_group_name() for time in manager.traces[trace]], ["Group 3"]
+        )
+
     def test_match(self):
         self.manager.match(["line 1"])
         self.assertEqual(len(self.manager.traces), 1)
+        self.manager.match(["line 3", "line 2", "line"])
+        self.assertEqual(len(self.manager.traces), 1)
         self.manager.match(["line 3"])
         self.assertEqual(len(self.manager.traces), 0)
 
+    def test_print_sorted(self):
+        trace = LockOpTrace(["line 1\n", "line 2\n"])
+        manager = LockTraceManager({trace: [
+            GroupTimes("Group 1", 10, 5),
+            GroupTimes("Group 2", 20, 1),
+            GroupTimes("Group 3", 5, 10),
+        ]})
+        with redirect_stdout(StringIO()):
+            manager.print(sort_held_time=True, sort_wait_time=False, list_traces=False)
+        self.assertEqual(
+            [time.get_group_name() for time in manager.traces[trace]],
+            ["Group 2", "Group 1", "Group 3"],
+        )
+        output = StringIO()
+        with redirect_stdout(output):
+            manager.print(sort_held_time=False, sort_wait_time=True, list_traces=False)
+        self.assertEqual(
+            output.getvalue(),
+            trace.format() +
+            "Group 3 held: 5 ms, wait: 10 ms\n"
+            "Group 1 held: 10 ms, wait: 5 ms\n"
+            "Group 2 held: 20 ms, wait: 1 ms\n\n",
+        )
+        self.assertEqual(
+            [time.get_group_name() for time in manager.traces[trace]],
+            ["Group 3", "Group 1", "Group 2"],
+        )
+
 
 class TestLocksFileReader(unittest.TestCase):
     def setUp(self):
@@ -102,6 +174,27 @@ class TestLocksFileReader(unittest.TestCase):
         self.file = StringIO(self.file_content)
         self.reader = LocksFileReader(self.file)
 
+    def test_no_project_start(self):
+        with self.assertRaises(ValueError):
+            LocksFileReader(StringIO("###START: Test 1\n"))
+        with self.assertRaises(ValueError):
+            LocksFileReader(StringIO(""))
+
+    def test_main_no_project_start(self):
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "filter.py")
+        with tempfile.NamedTemporaryFile("w", suffix=".log") as locks_file:
+            locks_file.write("###START: Test 1\n")
+            locks_file.flush()
+            result = subprocess.run(
+                [sys.executable, script, "-f", locks_file.name],
+                capture_output=True, text=True,
+            )
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(
+            result.stdout,
+            "state-lock-filter: First line expected to be the project start.\n",
+        )
+
     def test_get_test(self):
         test_output = self.reader.get_test("Test 1")
         self.assertIn("###START: Test 1\n", test_output)
@@ -109,15 +202,11 @@ class TestLocksFileReader(unittest.TestCase):
     def test_get_traces_times(self):
         traces_times = self.reader.get_traces_times()
         self.assertEqual(len(traces_times), 3)
-
-
-class TestGetNextMatch(unittest.TestCase):
-    def test_get_next_match(self):
-        lines = ["line 1\n", "line 2\n", "###START: Test\n", "line 3\n"]
-        result = get_next_match(lines, 0, "###START:")
-        self.assertEqual(result, 2)
-        result = get_next_match(lines, 2, "###START:")
-        self.assertEqual(result, -1)
+        times = traces_times[LockOpTrace(["line 3\n", "line 4\n", "line 5\n"])]
+        self.assertEqual(len(times), 1)
+        self.assertEqual(times[0].get_group_name(), "###START: Test 1\n")
+        self.assertEqual(times[0].get_held_time(), 10)
+        self.assertEqual(times[0].get_wait_time(), 5)
 
 
 if __name__ == "__main__":
@@ -39,6 +39,10 @@ class TestLockOpTraceFileReader(unittest.TestCase):
         reader2 = LockOpTraceFileReader(StringIO(self.sample_trace_5))
         self.assertIs(len(reader1.get_diff(reader2)), 0)
 
+    def test_line_without_location(self):
+        with self.assertRaises(RuntimeError):
+            LockOpTraceFileReader(StringIO("---TRACE 1---\n\nfile1:123 lock A\nunlock\n"))
+
 
 if __name__ == "__main__":
     unittest.main()
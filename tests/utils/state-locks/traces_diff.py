@@ -5,7 +5,7 @@ from __future__ import annotations
 import argparse
 from typing import IO
 
-from common import LockOpTrace, get_next_match
+from common import LockOpTrace, split_sections
 
 
 class LockOpTraceFileReader:
@@ -25,13 +25,8 @@ class LockOpTraceFileReader:
     def _read(self, traces_file: IO[str]) -> None:
         self.lines = traces_file.readlines()
 
-        current_line = 0
-        # Read the tests
-        while current_line < len(self.lines):
-            trace_lines = self._current_trace(current_line)
-            if len(trace_lines) == 0:
-                raise RuntimeError("Error parsing traces file")
-
+        # Read the traces, each one begins with a "---" title line
+        for trace_lines in split_sections(self.lines, 0, "---"):
             # Remove empty lines and title
             cleaned_lines = [
                 line for line in trace_lines if line.strip() and
@@ -41,28 +36,26 @@ class LockOpTraceFileReader:
             # Remove the file and line numbers
             # Line numbers could easily change over time
             # File paths could include snap versions which used to change
-            function_lines = [line.split(" ", 1)[1] for line in cleaned_lines]
+            function_lines = []
+            for line in cleaned_lines:
+                _, sep, function = line.partition(" ")
+                if not sep:
+                    raise RuntimeError(
+                        "Error parsing traces file, line without location: {}".format(line.rstrip())
+                    )
+                function_lines.append(function)
 
             # Save the traces in a dict to be able to print the version of the trace
             # with the file and line number which is not used to compare
             self.traces[LockOpTrace(function_lines)] = LockOpTrace(cleaned_lines)
-            current_line = current_line + len(trace_lines)
-
-    # This function works to detect the current trace
-    def _current_trace(self, start_line: int) -> list[str]:
-        next_match = get_next_match(self.lines, start_line, "---")
-        if next_match == -1:
-            return self.lines[start_line:len(self.lines)]
-        return self.lines[start_line:next_match]
 
     # Retieve the traces which are in other and are not in self
     def get_diff(self, other: LockOpTraceFileReader) -> list[LockOpTrace]:
-        diff_traces = []
-        my_traces = self.traces.keys()
-        for key_trace, val_trace in other.traces.items():
-            if key_trace not in my_traces:
-                diff_traces.append(val_trace)
-        return diff_traces
+        return [
+            val_trace
+            for key_trace, val_trace in other.traces.items()
+            if key_trace not in self.traces
+        ]
 
     # Print the traces which are in other and are not in self
     def print_diff(self, other: LockOpTraceFileReader):